@@ -0,0 +1,343 @@
+# --------------------------------------------------------------------------------------
+# Shared core for auto_purge.py and safe_purge.py: drive discovery, exclude trie,
+# scandir walker, quarantine helpers and buffered logging (stdlib only)
+# --------------------------------------------------------------------------------------
+
+import os
+import sys
+import gzip
+import time
+import errno
+import queue
+import shutil
+import atexit
+import logging
+import hashlib
+from pathlib import Path
+from datetime import datetime
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from string import ascii_uppercase
+
+NS_PER_DAY = 86_400_000_000_000
+
+@lru_cache(maxsize=1)
+def list_fixed_drives() -> tuple[str, ...]:
+    """Return existing drive roots like ('C:\\','D:\\',...); probed once per process."""
+    drives = []
+    for letter in ascii_uppercase:
+        root = f"{letter}:\\"
+        if os.path.exists(root):
+            drives.append(root)
+    return tuple(drives)
+
+def short_hash(s: str) -> str:
+    """8 hex char collision tag; blake2b with a 4-byte digest is cheaper than truncated sha256."""
+    return hashlib.blake2b(s.encode("utf-8", errors="ignore"), digest_size=4).hexdigest()
+
+def same_drive(p1: str, p2: str) -> bool:
+    return os.path.splitdrive(p1)[0].lower() == os.path.splitdrive(p2)[0].lower()
+
+# Marks the end of an excluded path inside the exclude trie
+_LEAF = object()
+
+def _path_parts(path: str) -> list[str]:
+    """Split an absolute path into normcased, non-empty components."""
+    return [p for p in os.path.normcase(path).split(os.sep) if p]
+
+def build_exclude_trie(exclude_dirs) -> dict:
+    """Build a nested-dict prefix trie over the path components of exclude_dirs.
+
+    Expects paths already run through os.path.normcase(os.path.abspath(...)).
+    """
+    trie = {}
+    for ex in exclude_dirs:
+        node = trie
+        for part in _path_parts(ex):
+            node = node.setdefault(part, {})
+        node[_LEAF] = True
+    return trie
+
+def is_excluded(path: str, exclude_trie: dict) -> bool:
+    """True if the absolute path is at or under an excluded directory."""
+    return trie_contains(_path_parts(path), exclude_trie)
+
+def trie_contains(path_parts: list[str], trie: dict) -> bool:
+    """True if path_parts is at or under any path stored in trie (O(depth))."""
+    node = trie
+    if _LEAF in node:
+        return True
+    for part in path_parts:
+        node = node.get(part)
+        if node is None:
+            return False
+        if _LEAF in node:
+            return True
+    return False
+
+def _created_ns(st: os.stat_result) -> int:
+    """Creation time; st_ctime is creation time on Windows before 3.12's st_birthtime."""
+    return getattr(st, "st_birthtime_ns", st.st_ctime_ns)
+
+def normalize_exts(exts) -> frozenset:
+    """Flatten extensions like ".PDF" into the dotless lowercase set scan_tree expects."""
+    return frozenset(e.lstrip(".").lower() for e in exts)
+
+def scan_tree(root: str, exclude_trie: dict, selected_exts: set[str], on_dir=None, on_error=None,
+              cutoff_ns: int | None = None, prune_created_after_ns: int | None = None, stop=None):
+    """Yield (path, mtime_ns) for files under root whose extension is selected.
+
+    selected_exts holds lowercased extensions without the leading dot (see
+    normalize_exts); an empty set matches every file. When
+    cutoff_ns is given, only files last modified before it are yielded, so
+    files that are too new never leave the walk loop. When
+    prune_created_after_ns is given, subdirectories created after it are not
+    descended into (opt-in: assumes nothing older was copied into them).
+    stop is an optional threading.Event; once set, the walk ends at the next
+    directory.
+
+    Uses os.scandir with an explicit stack so mtime comes from the DirEntry's
+    cached stat data instead of a second stat call per file.
+    """
+    # Cheap prefilter: most names can be rejected on their last character
+    # alone, before rpartition/lower allocate anything
+    last_chars = frozenset(c for e in selected_exts if e for c in (e[-1].lower(), e[-1].upper()))
+
+    stack = [root]
+    while stack:
+        if stop is not None and stop.is_set():
+            return
+        current = stack.pop()
+        if on_dir:
+            on_dir(current)
+
+        # Materialize the directory first so moves done by the caller don't
+        # race the open enumeration handle.
+        subdirs = []
+        found = []
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if is_excluded(entry.path, exclude_trie):
+                                continue
+                            if (prune_created_after_ns is not None
+                                    and _created_ns(entry.stat(follow_symlinks=False)) > prune_created_after_ns):
+                                continue
+                            subdirs.append(entry.path)
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+
+                    if selected_exts:
+                        name = entry.name
+                        if name[-1] not in last_chars:
+                            continue
+                        _, dot, tail = name.rpartition(".")
+                        if not dot or tail.lower() not in selected_exts:
+                            continue
+
+                    try:
+                        mtime_ns = entry.stat().st_mtime_ns
+                    except Exception as e:
+                        if on_error:
+                            on_error(entry.path, e)
+                        continue
+                    if cutoff_ns is None or mtime_ns < cutoff_ns:
+                        found.append((entry.path, mtime_ns))
+        except OSError:
+            continue
+
+        yield from found
+        # Reverse so siblings come off the stack in listing order
+        stack.extend(reversed(subdirs))
+
+def quarantine_move(src: str, dest: str, same_volume: bool) -> None:
+    """Move src to dest; a single os.replace when both are on the same volume."""
+    if same_volume:
+        try:
+            os.replace(src, dest)
+            return
+        except OSError as e:
+            # Same drive letter can still span volumes (mounted folders)
+            if e.errno != errno.EXDEV:
+                raise
+    shutil.move(src, dest)
+
+def quarantine_path(quarantine_root: str, src_path: str) -> str:
+#   Preserve drive + relative path under quarantine, with short hash to avoid collisions.
+#    Example: src: C:\Users\Bob\Docs\report.pdf dest: {Quarantine}\C\Users\Bob\Docs\report__a1b2c3d4.pdf
+#   Plain string ops (no Path objects) since this runs once per matched file.
+    drive, tail = os.path.splitdrive(src_path)
+    drive_letter = (drive.replace(":", "") or "ROOT")
+    rel_dir, name = os.path.split(tail.lstrip(os.sep))
+    base, ext = os.path.splitext(name)
+    return os.path.join(quarantine_root, drive_letter, rel_dir, f"{base}__{short_hash(src_path)}{ext}")
+
+# --------------------------------------------------------------------------------------
+# Logging (scan + move logs under PROGRAM_DATA_DIR\Logs)
+# --------------------------------------------------------------------------------------
+
+LOG_BUFFER_SIZE = 1 << 16
+
+class BufferedLogHandler(logging.Handler):
+    """Collect formatted records in a bytearray and write them in ~64 KiB chunks.
+
+    One write() per chunk instead of one per record; the buffer is drained on
+    flush()/close(), which logging.shutdown() also calls at interpreter exit.
+    With autoflush=True every record is written and flushed straight away.
+    """
+
+    def __init__(self, stream, close_stream: bool = False, autoflush: bool = False):
+        super().__init__()
+        self.stream = stream
+        self.close_stream = close_stream
+        self.autoflush = autoflush
+        self.buffer = bytearray()
+
+    def emit(self, record):
+        try:
+            self.buffer += (self.format(record) + "\n").encode("utf-8", errors="replace")
+            if self.autoflush:
+                self.flush()
+            elif len(self.buffer) >= LOG_BUFFER_SIZE:
+                self._drain()
+        except Exception:
+            self.handleError(record)
+
+    def _drain(self):
+        # Hand the chunk to the stream without forcing it out (keeps gzip
+        # from emitting a sync block every 64 KiB)
+        if self.buffer:
+            self.stream.write(self.buffer)
+            self.buffer.clear()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.stream is not None:
+                self._drain()
+                self.stream.flush()
+        finally:
+            self.release()
+
+    def close(self):
+        # Safe to call twice (stop_logging, then logging.shutdown at exit)
+        self.acquire()
+        try:
+            try:
+                self.flush()
+            finally:
+                if self.close_stream and self.stream is not None:
+                    self.stream.close()
+                self.stream = None
+        finally:
+            self.release()
+            super().close()
+
+class CachedTimeFormatter(logging.Formatter):
+    """Formatter that only re-runs strftime when the record's second changes."""
+
+    def __init__(self, fmt=None, datefmt=None, style="%"):
+        super().__init__(fmt, datefmt, style)
+        self._cached_second = None
+        self._cached_stamp = ""
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_stamp = time.strftime(self.default_time_format, self.converter(record.created))
+            self._cached_second = second
+        return self.default_msec_format % (self._cached_stamp, record.msecs)
+
+def _file_handler(path: Path, compress: bool = False, autoflush: bool = False) -> BufferedLogHandler:
+    if compress:
+        # Level 1 deflate: text logs shrink ~10x for very little CPU
+        stream = gzip.open(path.with_name(path.name + ".gz"), "wb", compresslevel=1)
+    else:
+        # Always a BufferedWriter: it writes the whole chunk, unlike raw FileIO
+        # which may return a short count; autoflush still flushes per record
+        stream = open(path, "wb", buffering=LOG_BUFFER_SIZE)
+    handler = BufferedLogHandler(stream, close_stream=True, autoflush=autoflush)
+    handler.setFormatter(CachedTimeFormatter("{asctime} - {message}", style="{"))
+    return handler
+
+def _console_handler() -> BufferedLogHandler | None:
+    # No console under pythonw.exe or a PyInstaller --noconsole build, and
+    # replaced text streams may have no binary buffer
+    if sys.stdout is None or not hasattr(sys.stdout, "buffer"):
+        return None
+    # Operators watch this live, so don't hold lines back
+    handler = BufferedLogHandler(sys.stdout.buffer, autoflush=True)
+    handler.setFormatter(logging.Formatter("{message}", style="{"))
+    return handler
+
+class LogListener(QueueListener):
+    """QueueListener that remembers whether stop_logging() already ran."""
+
+    stopped = False
+
+def make_logger_pair(program_data_dir: Path, compress_scan_log: bool = False):
+    """Create the scan/move loggers; records go through one queue to a single writer thread.
+
+    Returns (scan_logger, move_logger, listener); call stop_logging(listener)
+    when done.
+    """
+    logs_dir = program_data_dir / "Logs"
+    logs_dir.mkdir(parents=True, exist_ok=True)
+
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    scan_log_path = logs_dir / f"scan_log_{ts}.log"
+    move_log_path = logs_dir / f"move_log_{ts}.log"
+
+    # File handlers only take their own logger's records; the console handler
+    # is shared so echoed lines stay in order
+    scan_fh = _file_handler(scan_log_path, compress=compress_scan_log)
+    scan_fh.addFilter(logging.Filter("scan_logger"))
+    # The move log is the only record of where quarantined files came from:
+    # write every line through so a killed run can't lose it
+    move_fh = _file_handler(move_log_path, autoflush=True)
+    move_fh.addFilter(logging.Filter("move_logger"))
+    handlers = [scan_fh, move_fh]
+    console = _console_handler()
+    if console is not None:
+        handlers.append(console)
+
+    # Scan/move threads only put records on the queue; the listener thread is
+    # the sole writer, so they never wait on file handler locks
+    log_q = queue.SimpleQueue()
+    listener = LogListener(log_q, *handlers)
+
+    # Scan logger (file + console echo)
+    scan_logger = logging.getLogger("scan_logger")
+    scan_logger.setLevel(logging.INFO)
+    scan_logger.propagate = False
+    scan_logger.addHandler(QueueHandler(log_q))
+
+    # Move logger (file + console echo)
+    move_logger = logging.getLogger("move_logger")
+    move_logger.setLevel(logging.INFO)
+    move_logger.propagate = False
+    move_logger.addHandler(QueueHandler(log_q))
+
+    listener.start()
+    atexit.register(stop_logging, listener)
+    return scan_logger, move_logger, listener
+
+def stop_logging(listener: LogListener) -> None:
+    """Drain the log queue, then flush and close every handler; safe to call more than once.
+
+    Closing matters for the gzip scan log: it is only a valid .gz file once
+    its end-of-stream marker has been written.
+    """
+    if listener.stopped:
+        return
+    listener.stopped = True
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
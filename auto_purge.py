@@ -2,12 +2,25 @@ import os
 import sys
 import json
 import time
+import queue
 import shutil
-import logging
-import hashlib
+import threading
 from pathlib import Path
 from datetime import datetime
-from string import ascii_uppercase
+from concurrent.futures import ThreadPoolExecutor
+
+from _purge_core import (
+    NS_PER_DAY,
+    build_exclude_trie,
+    list_fixed_drives,
+    make_logger_pair,
+    normalize_exts,
+    quarantine_move,
+    quarantine_path,
+    same_drive,
+    scan_tree,
+    stop_logging,
+)
 
 # --------------------------------------------------------------------------------------
 # Utility helpers (no external deps; uses stdlib only)
@@ -37,15 +50,6 @@ def human_size(num_bytes: int) -> str:
         n /= 1024.0
     return f"{n:.0f} EB"
 
-def list_fixed_drives() -> list[str]:
-    """Return existing drive roots like ['C:\\','D:\\',...]"""
-    drives = []
-    for letter in ascii_uppercase:
-        root = f"{letter}:\\"
-        if os.path.exists(root):
-            drives.append(root)
-    return drives
-
 def disk_usage_safe(root: str):
     """shutil.disk_usage wrapper (works without psutil)."""
     try:
@@ -54,39 +58,6 @@ def disk_usage_safe(root: str):
     except Exception:
         return None
 
-def short_hash(s: str) -> str:
-    return hashlib.sha256(s.encode("utf-8", errors="ignore")).hexdigest()[:8]
-
-def same_drive(p1: str, p2: str) -> bool:
-    return os.path.splitdrive(p1)[0].lower() == os.path.splitdrive(p2)[0].lower()
-
-def is_under(path: str, prefix: str) -> bool:
-    """True if path is under prefix; safe across drives."""
-    try:
-        if not same_drive(path, prefix):
-            return False
-        cp = os.path.commonpath([os.path.abspath(path), os.path.abspath(prefix)])
-        return cp == os.path.abspath(prefix)
-    except Exception:
-        return False
-
-def should_exclude_dir(root: str, exclude_dirs: list[str]) -> bool:
-    for ex in exclude_dirs:
-        if is_under(root, ex):
-            return True
-    return False
-
-def build_quarantine_dest(quarantine_root: Path, src_path: Path) -> Path:
-#   Preserve drive + relative path under quarantine, with short hash to avoid collisions.
-#    Example: src: C:\Users\Bob\Docs\report.pdf dest: {Quarantine}\C\Users\Bob\Docs\report__a1b2c3d4.pdf
-    drive, _ = os.path.splitdrive(str(src_path))
-    drive_letter = (drive.replace(":", "") or "ROOT")
-    rel = src_path.relative_to(Path(drive + os.sep))
-    base = src_path.stem
-    ext = src_path.suffix
-    suffix = f"__{short_hash(str(src_path))}{ext}"
-    return quarantine_root / drive_letter / rel.parent / (base + suffix)
-
 # --------------------------------------------------------------------------------------
 # Config loading & validation
 # --------------------------------------------------------------------------------------
@@ -97,6 +68,9 @@ DEFAULTS_IF_MISSING = {
     "retention_days": 7,
     "dry_run": False,
     "AutoDelete":False,
+    "verbose_skip": False,
+    "compress_scan_log": False,
+    "fast_prune_recent_trees": False,
 }
 
 def load_config_or_exit() -> dict:
@@ -133,46 +107,60 @@ def load_config_or_exit() -> dict:
     return cfg
 
 # --------------------------------------------------------------------------------------
-# Logging setup (scan + move logs under PROGRAM_DATA_DIR\Logs)
+# Core scanning & quarantining
 # --------------------------------------------------------------------------------------
 
-def setup_loggers(program_data_dir: Path):
-    logs_dir = program_data_dir / "Logs"
-    logs_dir.mkdir(parents=True, exist_ok=True)
-
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    scan_log_path = logs_dir / f"scan_log_{ts}.log"
-    move_log_path = logs_dir / f"move_log_{ts}.log"
-
-    # Scan logger
-    scan_logger = logging.getLogger("scan_logger")
-    scan_logger.setLevel(logging.INFO)
-    scan_logger.propagate = False
-    scan_fh = logging.FileHandler(scan_log_path, mode="w", encoding="utf-8")
-    scan_fh.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
-    scan_logger.addHandler(scan_fh)
-    # Console echo for scan
-    scan_ch = logging.StreamHandler(sys.stdout)
-    scan_ch.setFormatter(logging.Formatter("%(message)s"))
-    scan_logger.addHandler(scan_ch)
-
-    # Move logger
-    move_logger = logging.getLogger("move_logger")
-    move_logger.setLevel(logging.INFO)
-    move_logger.propagate = False
-    move_fh = logging.FileHandler(move_log_path, mode="w", encoding="utf-8")
-    move_fh.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
-    move_logger.addHandler(move_fh)
-    # Console echo for moves
-    move_ch = logging.StreamHandler(sys.stdout)
-    move_ch.setFormatter(logging.Formatter("%(message)s"))
-    move_logger.addHandler(move_ch)
-
-    return scan_logger, move_logger
+# Put on the results queue by a drive worker once its walk has finished
+_DRIVE_DONE = object()
 
-# --------------------------------------------------------------------------------------
-# Core scanning & quarantining
-# --------------------------------------------------------------------------------------
+def _put_unless_stopped(results: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put item on the bounded queue, giving up once stop is set (consumer is gone)."""
+    while not stop.is_set():
+        try:
+            results.put(item, timeout=0.2)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _scan_drive(results: queue.Queue, stop: threading.Event, drive: str, exclude_trie: dict,
+                ext_frozen: frozenset, on_dir=None, on_error=None, cutoff_ns: int | None = None,
+                prune_created_after_ns: int | None = None) -> None:
+    """Walk one drive and feed (path, mtime_ns) matches into results (runs in a worker thread)."""
+    try:
+        for item in scan_tree(drive, exclude_trie, ext_frozen, on_dir, on_error,
+                              cutoff_ns, prune_created_after_ns, stop):
+            if not _put_unless_stopped(results, item, stop):
+                return
+    finally:
+        _put_unless_stopped(results, _DRIVE_DONE, stop)
+
+MOVE_WORKERS = 4
+
+# Put on the move queue once per worker to shut it down
+_STOP = object()
+
+def _move_worker(jobs: queue.Queue, quarantine_dir: str, created_parents: set, log_move, emit) -> None:
+    """Drain (src, dest, age_days) jobs into quarantine until _STOP (runs in a worker thread)."""
+    while True:
+        job = jobs.get()
+        try:
+            if job is _STOP:
+                return
+            fpath, dest, age_days = job
+            try:
+                parent = os.path.dirname(dest)
+                if parent not in created_parents:
+                    os.makedirs(parent, exist_ok=True)
+                    created_parents.add(parent)
+                quarantine_move(fpath, dest, same_drive(fpath, quarantine_dir))
+                log_move(f"[MOVE] {fpath} -> {dest} ({age_days} days old)")
+            except PermissionError as e:
+                emit(f"[DENIED] move {fpath} | {e}")
+            except Exception as e:
+                emit(f"[ERROR] move {fpath} | {e}")
+        finally:
+            jobs.task_done()
 
 def run_scan(cfg: dict):
     PROGRAM_DATA_DIR = Path(cfg["PROGRAM_DATA_DIR"])
@@ -181,108 +169,129 @@ def run_scan(cfg: dict):
     QUARANTINE_DIR.mkdir(parents=True, exist_ok=True)
     LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
-    scan_logger, move_logger = setup_loggers(PROGRAM_DATA_DIR)
+    scan_logger, move_logger, log_listener = make_logger_pair(PROGRAM_DATA_DIR, cfg["compress_scan_log"])
+    # Scan logger already echoes to the console, so one call covers both
+    emit = scan_logger.info
 
     # Effective excludes: user-provided + our own (Quarantine & Logs)
-    EXCLUDE_DIRS = [os.path.abspath(p) for p in cfg["EXCLUDE_DIRS"]]
-    EXCLUDE_DIRS.extend([
-        str(QUARANTINE_DIR.resolve()),
-        str(LOGS_DIR.resolve()),
-        str(PROGRAM_DATA_DIR.resolve()),
-    ])
+    # normalized once here so nothing on the walk has to call abspath again
+    EXCLUDE_DIRS = tuple(
+        os.path.normcase(os.path.abspath(p))
+        for p in cfg["EXCLUDE_DIRS"] + [QUARANTINE_DIR, LOGS_DIR, PROGRAM_DATA_DIR]
+    )
+    exclude_trie = build_exclude_trie(EXCLUDE_DIRS)
 
-    # Extensions to include = union of all categories ("all")
-    SELECTED_EXTS = set(cfg["FILE_CATEGORIES"]["all"])
+    # Extensions to include = union of all categories ("all"), stored without
+    # the dot so the scan can match on name.rpartition(".") directly
+    EXT_FROZEN = normalize_exts(cfg["FILE_CATEGORIES"]["all"])
 
     # Header
-    scan_logger.info("=" * 80)
-    print("=" * 80)
-    scan_logger.info(f"START scan | retention_days={cfg['retention_days']} | dry_run={cfg['dry_run']}")
-    print(f"START scan | retention_days={cfg['retention_days']} | dry_run={cfg['dry_run']}")
-    scan_logger.info(f"ProgramDataDir={PROGRAM_DATA_DIR} | Quarantine={QUARANTINE_DIR} | Logs={LOGS_DIR}")
-    print(f"ProgramDataDir={PROGRAM_DATA_DIR} | Quarantine={QUARANTINE_DIR} | Logs={LOGS_DIR}")
+    emit("=" * 80)
+    emit(f"START scan | retention_days={cfg['retention_days']} | dry_run={cfg['dry_run']}")
+    emit(f"ProgramDataDir={PROGRAM_DATA_DIR} | Quarantine={QUARANTINE_DIR} | Logs={LOGS_DIR}")
 
     # Disk usage summary
-    scan_logger.info("=== Disk Usage ===")
+    emit("=== Disk Usage ===")
     for drive in list_fixed_drives():
         du = disk_usage_safe(drive)
         if du:
             total, used, free = du
-            scan_logger.info(f"{drive} - Total: {human_size(total)}, Used: {human_size(used)}, Free: {human_size(free)}")
-            print(f"{drive} - Total: {human_size(total)}, Used: {human_size(used)}, Free: {human_size(free)}")
+            emit(f"{drive} - Total: {human_size(total)}, Used: {human_size(used)}, Free: {human_size(free)}")
         else:
-            scan_logger.info(f"{drive} - (unavailable)")
-            print(f"{drive} - (unavailable)")
-    scan_logger.info("-" * 80)
-
-    # Cutoff epoch
-    cutoff_epoch = time.time() - (cfg["retention_days"] * 86400)
-
-    # Walk all drives
-    for drive in list_fixed_drives():
-        for root, dirs, files in os.walk(drive, topdown=True):
-            # Prune excluded dirs in-place
-            pruned = []
-            for d in list(dirs):
-                full = os.path.join(root, d)
-                if should_exclude_dir(full, EXCLUDE_DIRS):
-                    pruned.append(d)
-            for d in pruned:
-                dirs.remove(d)
-
-            # Echo current directory being scanned
-            scan_logger.info(f"[SCAN] {root}")
-            print(f"[SCAN] {root}")
-
-            for fname in files:
-                fpath = os.path.join(root, fname)
-                ext = os.path.splitext(fname)[1].lower()
-
-                if ext not in SELECTED_EXTS:
-                    continue
-
-                try:
-                    mtime = os.path.getmtime(fpath)
-                except FileNotFoundError:
-                    scan_logger.info(f"[GONE] {fpath}")
-                    print(f"[GONE] {fpath}")
-                    continue
-                except PermissionError as e:
-                    scan_logger.info(f"[DENIED] {fpath} | {e}")
-                    print(f"[DENIED] {fpath} | {e}")
-                    continue
-                except Exception as e:
-                    scan_logger.info(f"[ERROR] {fpath} | {e}")
-                    print(f"[ERROR] {fpath} | {e}")
-                    continue
-
-                age_days = int((time.time() - mtime) // 86400)
-
-                if mtime < cutoff_epoch:
-                    # Qualifies by retention age
-                    scan_logger.info(f"[MATCH] {fpath} ({age_days} days old)")
-                    if not cfg["dry_run"]:
-                        try:
-                            dest = build_quarantine_dest(QUARANTINE_DIR, Path(fpath))
-                            dest.parent.mkdir(parents=True, exist_ok=True)
-                            shutil.move(fpath, dest)
-                            move_logger.info(f"[MOVE] {fpath} -> {dest} ({age_days} days old)")
-                            print(f"[MOVE] {fpath} -> {dest} ({age_days} days old)")
-                        except PermissionError as e:
-                            scan_logger.info(f"[DENIED] move {fpath} | {e}")
-                            print(f"[DENIED] move {fpath} | {e}")
-                        except Exception as e:
-                            scan_logger.info(f"[ERROR] move {fpath} | {e}")
-                            print(f"[ERROR] move {fpath} | {e}")
-                else:
-                    scan_logger.info(f"[SKIP] {fpath} ({age_days} days old)")
-                    print(f"[SKIP] {fpath} ({age_days} days old)")
-
-    scan_logger.info("END scan")
-    print("END scan")
-    scan_logger.info("=" * 80)
+            emit(f"{drive} - (unavailable)")
+    emit("-" * 80)
+
+    # Cutoff in integer nanoseconds; "now" is taken once and treated as
+    # constant for the scan
+    scan_start_ns = time.time_ns()
+    cutoff_ns = scan_start_ns - cfg["retention_days"] * NS_PER_DAY
+
+    # Locals for the per-file loop
+    dry_run = cfg["dry_run"]
+    verbose_skip = cfg["verbose_skip"]
+    quarantine_dir = str(QUARANTINE_DIR)
+    log_move = move_logger.info
+    # Quarantine subfolders already created this scan (shared by the movers;
+    # a racing duplicate makedirs is harmless with exist_ok)
+    created_parents = set()
+
+    def report_dir(root: str) -> None:
+        # Echo current directory being scanned
+        emit(f"[SCAN] {root}")
+
+    def report_error(fpath: str, e: Exception) -> None:
+        if isinstance(e, FileNotFoundError):
+            emit(f"[GONE] {fpath}")
+        elif isinstance(e, PermissionError):
+            emit(f"[DENIED] {fpath} | {e}")
+        else:
+            emit(f"[ERROR] {fpath} | {e}")
+
+    # Quarantine moves run on background workers so the scan never waits on them
+    jobs = queue.Queue(maxsize=512)
+    movers = [
+        threading.Thread(target=_move_worker, args=(jobs, quarantine_dir, created_parents, log_move, emit),
+                         daemon=True)
+        for _ in range(MOVE_WORKERS)
+    ]
+    for t in movers:
+        t.start()
+
+    # Walk all drives in parallel: one worker per drive feeds a bounded queue,
+    # and this thread does the logging and hands matches to the movers.
+    drives = list_fixed_drives()
+    results = queue.Queue(maxsize=10_000)
+    # Without [SKIP] logging only aged files matter, so let the walkers drop
+    # the rest before they reach the queue
+    walk_cutoff_ns = None if verbose_skip else cutoff_ns
+    # Opt-in: trees created after the cutoff are assumed to hold only newer files
+    prune_ns = cutoff_ns if cfg["fast_prune_recent_trees"] else None
+    # Set if the consumer below fails, so drive workers blocked on a full
+    # queue give up instead of hanging the pool shutdown
+    stop = threading.Event()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(drives))) as pool:
+            futures = {
+                pool.submit(_scan_drive, results, stop, drive, exclude_trie, EXT_FROZEN,
+                            report_dir, report_error, walk_cutoff_ns, prune_ns): drive
+                for drive in drives
+            }
+            try:
+                remaining = len(futures)
+                while remaining:
+                    item = results.get()
+                    if item is _DRIVE_DONE:
+                        remaining -= 1
+                        continue
+                    fpath, mtime_ns = item
+                    age_days = (scan_start_ns - mtime_ns) // NS_PER_DAY
+
+                    if mtime_ns < cutoff_ns:
+                        # Qualifies by retention age
+                        emit(f"[MATCH] {fpath} ({age_days} days old)")
+                        if not dry_run:
+                            jobs.put((fpath, quarantine_path(quarantine_dir, fpath), age_days))
+                    elif verbose_skip:
+                        emit(f"[SKIP] {fpath} ({age_days} days old)")
+            finally:
+                stop.set()
+
+            for future, drive in futures.items():
+                if future.exception() is not None:
+                    emit(f"[ERROR] scan {drive} | {future.exception()}")
+    finally:
+        # Let the movers finish everything queued, then stop them
+        jobs.join()
+        for _ in movers:
+            jobs.put(_STOP)
+        for t in movers:
+            t.join()
+
+    emit("END scan")
+    emit("=" * 80)
     if cfg["AutoDelete"]:
         clear_directory(QUARANTINE_DIR,scan_logger)
+    stop_logging(log_listener)
 
 def clear_directory(directory_path, logger):
 #Delete all files and subdirectories in the specified directory."""
@@ -302,7 +311,6 @@ def clear_directory(directory_path, logger):
                 shutil.rmtree(item_path)
         except Exception as e:
             logger.info(f"Failed to delete {item_path}. Reason: {e}")
-            print(f"Failed to delete {item_path}. Reason: {e}")
 
     logger.info(f"Finished clearing quarantine directory: {directory_path}")
 
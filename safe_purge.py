@@ -1,13 +1,23 @@
 #!/usr/bin/env python3
 # pip install psutil
 import os
-import shutil
+import time
 import logging
 import argparse
-import string
 import datetime
 import psutil
 
+from _purge_core import (
+    NS_PER_DAY,
+    build_exclude_trie,
+    is_excluded,
+    list_fixed_drives,
+    normalize_exts,
+    quarantine_move,
+    same_drive,
+    scan_tree,
+)
+
 # =====================
 # CONFIGURATION
 # =====================
@@ -44,6 +54,9 @@ EXCLUDE_DIRS = [
     r"E:\Program Files (x86)",
     r"C:\FilePurger"]
 
+# Normalized once into a prefix trie so exclusion is an O(depth) lookup
+EXCLUDE_TRIE = build_exclude_trie(os.path.normcase(os.path.abspath(e)) for e in EXCLUDE_DIRS)
+
 # =====================
 # LOGGING
 # =====================
@@ -65,23 +78,10 @@ moved_logger.setLevel(logging.INFO)
 # =====================
 # FUNCTIONS
 # =====================
-def is_excluded(path):
-    abs_path = os.path.abspath(path)
-    for excl in EXCLUDE_DIRS:
-        try:
-            if os.path.commonpath([abs_path, excl]) == excl:
-                return True
-        except ValueError:
-            continue
-    return False
-
-def get_all_drives():
-    return [f"{d}:\\" for d in string.ascii_uppercase if os.path.exists(f"{d}:\\")]
-
 def log_disk_usage():
     logging.info("=== Disk Usage ===")
     print("=== Disk Usage ===")
-    for drive in get_all_drives():
+    for drive in list_fixed_drives():
         try:
             usage = psutil.disk_usage(drive)
             logging.info(f"{drive} - Total: {usage.total // (1024**3)} GB, Used: {usage.used // (1024**3)} GB, Free: {usage.free // (1024**3)} GB")
@@ -89,42 +89,47 @@ def log_disk_usage():
         except Exception as e:
             logging.warning(f"Could not get usage for {drive}: {e}")
 
-def purge_files(categories, retention_days, dry_run):
-    now = datetime.datetime.now()
+def purge_files(categories, retention_days, dry_run, fast_prune=False):
+    now_ns = time.time_ns()
+    # Directories created after this can only hold files younger than retention_days
+    prune_ns = now_ns - retention_days * NS_PER_DAY if fast_prune else None
     extensions = []
     for cat in categories:
         extensions.extend(FILE_CATEGORIES.get(cat, []))
+    ext_set = normalize_exts(extensions)
+
+    def report_error(file_path, e):
+        logging.error(f"Error processing {file_path}: {e}")
+        print(f"Error processing {file_path}: {e}")
+
+    # Quarantine folders already created this run; each is made at most once
+    created_dirs = set()
 
     log_disk_usage()
 
-    for drive in get_all_drives():
-        for root, dirs, files in os.walk(drive):
-            if is_excluded(root):
-                dirs[:] = []  # skip deeper in excluded paths
-                continue
-
-            for file in files:
-                file_path = os.path.join(root, file)
-                if extensions and not file.lower().endswith(tuple(extensions)):
-                    continue
-
-                try:
-                    mtime = datetime.datetime.fromtimestamp(os.path.getmtime(file_path))
-                    age_days = (now - mtime).days
-                    if age_days >= retention_days:
-                        logging.info(f"[MATCH] {file_path} ({age_days} days old)")
-                        print(f"[MATCH] {file_path} ({age_days} days old)")
-                        if not dry_run:
-                            dest_path = os.path.join(QUARANTINE_DIR, os.path.relpath(file_path, drive))
-                            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-                            shutil.move(file_path, dest_path)
-                            moved_logger.info(f"{file_path} -> {dest_path}")
-                    else:
-                        logging.info(f"[SKIP] {file_path} ({age_days} days old)")
-                        print(f"[SKIP] {file_path} ({age_days} days old)")
-                except Exception as e:
-                    logging.error(f"Error processing {file_path}: {e}")
-                    print(f"Error processing {file_path}: {e}")
+    for drive in list_fixed_drives():
+        if is_excluded(drive, EXCLUDE_TRIE):
+            continue
+        for file_path, mtime_ns in scan_tree(drive, EXCLUDE_TRIE, ext_set, on_error=report_error,
+                                             prune_created_after_ns=prune_ns):
+            try:
+                age_days = (now_ns - mtime_ns) // NS_PER_DAY
+                if age_days >= retention_days:
+                    logging.info(f"[MATCH] {file_path} ({age_days} days old)")
+                    print(f"[MATCH] {file_path} ({age_days} days old)")
+                    if not dry_run:
+                        dest_path = os.path.join(QUARANTINE_DIR, os.path.relpath(file_path, drive))
+                        dest_dir = os.path.dirname(dest_path)
+                        if dest_dir not in created_dirs:
+                            os.makedirs(dest_dir, exist_ok=True)
+                            created_dirs.add(dest_dir)
+                        quarantine_move(file_path, dest_path, same_drive(file_path, QUARANTINE_DIR))
+                        moved_logger.info(f"{file_path} -> {dest_path}")
+                else:
+                    logging.info(f"[SKIP] {file_path} ({age_days} days old)")
+                    print(f"[SKIP] {file_path} ({age_days} days old)")
+            except Exception as e:
+                report_error(file_path, e)
 
     log_disk_usage()
 
@@ -137,10 +142,12 @@ if __name__ == "__main__":
                         help="Comma-separated categories (documents,videos,images)")
     parser.add_argument("--retention-days", type=int, default=30, help="Retention period in days")
     parser.add_argument("--dry-run", action="store_true", help="Scan only, no file moves")
+    parser.add_argument("--fast-prune-recent-trees", action="store_true",
+                        help="Skip folders created within the retention period (assumes no older files were copied in)")
     args = parser.parse_args()
 
     categories = [c.strip().lower() for c in args.category.split(",") if c.strip()]
-    purge_files(categories, args.retention_days, args.dry_run)
+    purge_files(categories, args.retention_days, args.dry_run, args.fast_prune_recent_trees)
 
     print(f"\nScan complete. Full log: {scan_log_path}")
     print(f"Moved files log: {moved_log_path}")